@@ -14,11 +14,21 @@ Usage:
 
 """
 
+import email.utils
+import functools
+import logging
 import os
-import requests
 
+import ijson
 import pandas as pd
 
+from mtg import utils
+
+try:
+    import orjson as json
+except ImportError:
+    import json
+
 
 # ----------------------------- #
 #   Module Constants            #
@@ -29,6 +39,9 @@ CARD_URL = 'http://mtgjson.com/json/AllSets.json'
 
 # local html caching
 HTML_DIR = os.path.join(os.sep, 'tmp', 'local_html_cache')
+_DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+LOGGER = logging.getLogger(__name__)
 
 
 # ----------------------------- #
@@ -47,13 +60,79 @@ class MtgCard(dict):
     pass
 
 
-def get_cards(url=CARD_URL):
+def _get_cached_json(url, localdir=HTML_DIR):
+    """download a json file to a local cache, using conditional GETs so that
+    an unchanged remote file is never re-downloaded
+
+    args:
+        url (str): url of the json file
+        localdir (str): directory in which we will save files
+            (default: HTML_DIR)
+
+    returns:
+        str: path to the up-to-date local copy of the file
+
+    raises:
+        requests.HTTPError: if the download fails
+
+    """
+    localname = os.path.join(localdir, os.path.basename(url))
+    etagname = '{}.etag'.format(localname)
+
+    headers = {}
+    if os.access(localname, os.R_OK):
+        headers['If-Modified-Since'] = email.utils.formatdate(
+            os.path.getmtime(localname), usegmt=True)
+        if os.access(etagname, os.R_OK):
+            with open(etagname, 'r') as fp:
+                headers['If-None-Match'] = fp.read().strip()
+
+    # AllSets.json is hundreds of MB, so stream it to disk in chunks rather
+    # than holding the whole body in memory first
+    with utils.SESSION.get(url, headers=headers, stream=True) as resp:
+        if resp.status_code == 304:
+            LOGGER.debug('using cached copy of url: %s', url)
+            return localname
+        resp.raise_for_status()
+
+        LOGGER.debug('active download of url: %s', url)
+        utils.atomic_write(
+            localname, resp.iter_content(chunk_size=_DOWNLOAD_CHUNK_SIZE))
+
+    etag = resp.headers.get('ETag')
+    if etag:
+        with open(etagname, 'w') as fp:
+            fp.write(etag)
+    elif os.path.exists(etagname):
+        os.remove(etagname)
+
+    return localname
+
+
+@functools.lru_cache(maxsize=1)
+def get_allsets(url=CARD_URL):
+    """the parsed {setname: setdict} contents of the MTGJSON file at `url`.
+    this is memoized, so repeated calls within a process share one parse (do
+    not modify the returned dict)
+
+    """
+    with open(_get_cached_json(url), 'rb') as fp:
+        return json.loads(fp.read())
+
+
+def get_cards(url=CARD_URL, stream=True):
     """Download all card data from mtgjson.com (see
     http://mtgjson.com/documentation.html for more information about the various
     fields available to us)
 
+    the download is cached locally and only repeated when the remote file
+    changes
+
     args:
         url: base url of mtgjson api (default: scrape.CARD_URL)
+        stream: whether or not to parse the file incrementally, holding only
+            one set in memory at a time. if False, the memoized result of
+            `get_allsets` is used instead (default: True)
 
     returns:
         iterable of MtgCard objects
@@ -62,28 +141,44 @@ def get_cards(url=CARD_URL):
         None
 
     """
-    # download the JSON file
-    cards = requests.get(url).json()
-
+    if stream:
+        # walk the top-level {setname: setdict} mapping as it is read instead
+        # of materializing the whole document
+        with open(_get_cached_json(url), 'rb') as fp:
+            for setname, setdict in ijson.kvitems(fp, '', use_float=True):
+                yield from _set_cards(setname, setdict)
+    else:
+        for setname, setdict in get_allsets(url).items():
+            yield from _set_cards(setname, setdict)
+
+
+def _set_cards(setname, setdict):
     # iterate through the json objects, parsing one at a time into card objects
-    for setname, setdict in cards.items():
-        for card in setdict['cards']:
-            c = MtgCard()
-            c.update(card)
-            c.update({'setname': setname})
-            yield c
+    for card in setdict['cards']:
+        yield MtgCard(card, setname=setname)
+
+
+def _card_names(url=CARD_URL):
+    """a single pass over the cards, collecting the set of all card names and
+    the set of land card names"""
+    cns = set()
+    landcns = set()
+    for c in get_cards(url, stream=False):
+        cns.add(c.get('name'))
+        if 'Land' in c.get('types', []):
+            landcns.add(c.get('name'))
+    return cns, landcns
 
 
 def all_land_card_names(url=CARD_URL):
-    return {_.get('name')
-            for _ in get_cards(url) if 'Land' in _.get('types', [])}
+    return _card_names(url)[1]
 
 
 def all_card_names(url=CARD_URL, ignore_lands=True):
     """a set of all the card names. ignore basic lands by default"""
-    cns = {_.get('name') for _ in get_cards(url)}
+    cns, landcns = _card_names(url)
     if ignore_lands:
-        cns = cns.difference(all_land_card_names(url))
+        cns -= landcns
     return cns
 
 
@@ -97,4 +192,12 @@ def cards_df(url=CARD_URL):
         pandas dataframe of mtg cards
 
     """
-    return pd.DataFrame(get_cards(url))
+    # flatten the already-parsed sets directly rather than building the
+    # frame row-by-row from get_cards. max_level=0 leaves nested card fields
+    # (legalities, rulings, etc) as objects, as before
+    return pd.json_normalize([{'setname': setname, 'cards': setdict['cards']}
+                              for (setname, setdict)
+                              in get_allsets(url).items()],
+                             record_path='cards',
+                             meta='setname',
+                             max_level=0)
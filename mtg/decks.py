@@ -14,20 +14,234 @@ Usage:
 
 """
 
+import functools as _functools
 import logging as _logging
 
 import numpy as _np
 
 from mtg import cards
 
+try:
+    from numba import njit as _njit
+except ImportError:
+    _njit = None
+
 # ----------------------------- #
 #   Module Constants            #
 # ----------------------------- #
 
 _LOGGER = _logging.getLogger(__name__)
-_LOGGER.setLevel(_logging.INFO)
-_CARD_UNIVERSE = {'no_lands': cards.all_card_names(ignore_lands=True),
-                  'w_lands': cards.all_card_names(ignore_lands=False), }
+
+# a catch-all bucket for hard-coded card name replacements
+_CARD_NAME_REMAP = {'Seance': 'Séance'}
+
+
+@_functools.lru_cache(maxsize=None)
+def _card_universe(ignore_lands):
+    """frozenset of every card name (with or without lands), built on first use
+    and then shared by every deck
+
+    """
+    return frozenset(cards.all_card_names(ignore_lands=ignore_lands))
+
+
+# every card name any deck has seen gets a stable int32 id; decks store and
+# sample those ids and names are only looked up again on the way out
+_CARD_ID = {}
+_CARD_NAMES = []
+_CARD_NAME_ARRAY = _np.empty(0, dtype='O')
+
+# one shared generator for all the sampling below
+_RNG = _np.random.default_rng()
+
+
+def _card_id(cardname):
+    try:
+        return _CARD_ID[cardname]
+    except KeyError:
+        _CARD_ID[cardname] = len(_CARD_NAMES)
+        _CARD_NAMES.append(cardname)
+        return _CARD_ID[cardname]
+
+
+def _card_ids(cardnames):
+    """int32 array of the ids of `cardnames`, registering new names as needed"""
+    return _np.fromiter((_card_id(c) for c in cardnames), dtype=_np.int32,
+                        count=len(cardnames))
+
+
+def card_names(ids):
+    """map an array of card ids (of any shape) back to card names
+
+    args:
+        ids (np.ndarray): integer card ids as returned by the sampling methods
+
+    returns:
+        np.ndarray: object array of card names with the same shape as `ids`
+
+    """
+    global _CARD_NAME_ARRAY
+    if _CARD_NAME_ARRAY.shape[0] != len(_CARD_NAMES):
+        _CARD_NAME_ARRAY = _np.array(_CARD_NAMES, dtype='O')
+    return _CARD_NAME_ARRAY[ids]
+
+
+@_functools.lru_cache(maxsize=8)
+def _universe_ids(universe):
+    """sorted int32 ids of every card name in the frozenset `universe`, so the
+    set algebra in `Deck` can run as sorted-array operations"""
+    return _np.unique(_card_ids(universe))
+
+
+def _cdf(p, n):
+    """normalized cumulative distribution of the weights `p` over `n` ids
+
+    args:
+        p (array-like): one non-negative weight per id
+        n (int): the number of ids being sampled from
+
+    returns:
+        np.ndarray: float64 cdf of length `n`, ending in 1.0
+
+    raises:
+        DeckError: if `p` doesn't have one finite, non-negative weight per id
+            or its weights sum to zero
+
+    """
+    p = _np.asarray(p, dtype=_np.float64)
+    if p.ndim != 1 or p.shape[0] != n:
+        msg = 'p must have exactly one weight per card ({} != {})'.format(
+            p.shape, n)
+        _LOGGER.error(msg)
+        raise DeckError(msg)
+    if not _np.isfinite(p).all() or (p < 0).any():
+        msg = 'p must contain only finite, non-negative weights'
+        _LOGGER.error(msg)
+        raise DeckError(msg)
+    cdf = _np.cumsum(p)
+    if not cdf[-1] > 0:
+        msg = 'p must have a positive sum'
+        _LOGGER.error(msg)
+        raise DeckError(msg)
+    cdf /= cdf[-1]
+    return cdf
+
+
+def _sample(ids, size, replace=True, p=None, cdf=None):
+    """draw `size` elements of `ids` using the shared generator
+
+    sampling with replacement is just a gather at random indices: uniform
+    integers for uniform weights, or uniform floats looked up in the cdf of
+    `p`. both are much cheaper than a full `choice` call. callers drawing
+    repeatedly with the same weights can pass the `cdf` (from `_cdf`) they
+    already built
+
+    """
+    if replace and p is None and cdf is None:
+        return ids[_RNG.integers(0, ids.shape[0], size=size)]
+    if replace:
+        if cdf is None:
+            cdf = _cdf(p, ids.shape[0])
+        return ids[_np.searchsorted(cdf, _RNG.random(size), side='right')]
+    return _RNG.choice(ids, size, replace=replace, p=p)
+
+
+def _unique_rows(c):
+    """the distinct rows of 2d int32 array `c`
+
+    same as `np.unique(c, axis=0)` up to row order, but each row is packed into
+    a single scalar (an int64 for pairs, raw bytes otherwise) so the sort runs
+    on one flat array
+
+    """
+    c = _np.ascontiguousarray(c)
+    if c.shape[1] == 2:
+        packed = c.view(_np.int64).ravel()
+    else:
+        packed = c.view(_np.dtype((_np.void,
+                                   c.dtype.itemsize * c.shape[1]))).ravel()
+    return _np.unique(packed).view(c.dtype).reshape(-1, c.shape[1])
+
+
+def _floyd_kernel(js, ts):
+    """the sequential part of Floyd's algorithm: step `i` keeps its pre-drawn
+    `ts[i]` unless that was already taken, in which case it takes `js[i]`
+
+    """
+    k = len(js)
+    out = _np.empty(k, dtype=_np.int64)
+    # seed the set with a value so numba can infer its type, then empty it
+    chosen = {ts[0]}
+    chosen.discard(ts[0])
+    for i in range(k):
+        t = ts[i]
+        if t in chosen:
+            t = js[i]
+        chosen.add(t)
+        out[i] = t
+    return out
+
+
+# compile the kernel when numba is available; otherwise it runs as plain python
+# on lists, which index much faster than numpy arrays element by element
+if _njit is not None:
+    _floyd_kernel = _njit(cache=True)(_floyd_kernel)
+
+
+def _floyd(n, k):
+    """`k` distinct integers from [0, n) via Robert Floyd's algorithm
+
+    one random draw per returned value and no retries, regardless of how close
+    `k` is to `n`. the draws come from the shared generator up front, so the
+    (optionally jitted) kernel never touches a random state of its own
+
+    """
+    if k == 0:
+        return _np.empty(0, dtype=_np.int64)
+    js = _np.arange(n - k, n, dtype=_np.int64)
+    ts = _RNG.integers(0, js + 1)
+    if _njit is None:
+        return _floyd_kernel(js.tolist(), ts.tolist())
+    return _floyd_kernel(js, ts)
+
+
+def _unique_pairs(nrows, left, right=None):
+    """`nrows` distinct (left, right) rows of ids, sampled without retries
+
+    every possible pair gets an integer code -- `len(left) * len(right)` codes
+    for pairs across two pools, or `n * (n - 1)` codes for ordered pairs of two
+    different cards from `left` alone -- and distinct codes are drawn directly
+    with `_floyd` and decoded back into pairs
+
+    args:
+        nrows (int): number of rows to return
+        left (np.ndarray): ids for the first column
+        right (np.ndarray): ids for the second column, or None to take both
+            columns from `left` (default: None)
+
+    returns:
+        np.ndarray: (nrows x 2) int32 array of ids
+
+    raises:
+        DeckError
+
+    """
+    n = left.shape[0]
+    if right is None:
+        npairs = n * (n - 1)
+    else:
+        npairs = n * right.shape[0]
+    if nrows > npairs:
+        raise DeckError("can't uniquely sample that many cards")
+
+    codes = _floyd(npairs, nrows)
+    if right is None:
+        i, j = _np.divmod(codes, max(n - 1, 1))
+        j += j >= i
+        right = left
+    else:
+        i, j = _np.divmod(codes, right.shape[0])
+    return _np.stack([left[i], right[j]], axis=1)
 
 
 # ----------------------------- #
@@ -65,7 +279,8 @@ class Deck(object):
                 and regardless of value of `ignore_lands`. this is because the
                 purpose of this set is to define cards that *exist*, not cards
                 we care about for the sampling (that is what the second
-                parameter is for) (default: _CARD_UNIVERSE with lands)
+                parameter is for) (default: the full card universe with
+                lands)
             ignore_lands (bool): whether or not we should ignore lands in all of
                 our various collections of cards (default: True)
 
@@ -79,75 +294,93 @@ class Deck(object):
         # reasonable default values
         self.cardnames = set(cardnames or set())
         self.name = name or ''
-        self.card_universe = card_universe or _CARD_UNIVERSE['w_lands']
+        self.card_universe = card_universe or _card_universe(False)
         self.ignore_lands = ignore_lands
 
+        # the shared default universe is already a frozenset (and its ids are
+        # cached); only build a set for user-supplied universes
+        if isinstance(self.card_universe, frozenset):
+            universe_ids = _universe_ids(self.card_universe)
+        else:
+            universe_ids = _universe_ids(frozenset(self.card_universe))
+        self._universe_ids = universe_ids
+
         # collect all general purpose cleanup and prep work in one function
         self.cardnames = self._clean_cards(self.cardnames)
 
         # the general purpose cleanup will have exposed some lands
 
         # drop all cards that appear in the deck but not in the defined card
-        # universe. keep them around as list of dropped cards for reference
-        self._dropcards = set()
-        dropcards = self.cardnames.difference(set(self.card_universe))
-        for dc in dropcards:
-            _LOGGER.warning('card not in card universe: "{}"'.format(dc))
-            self.cardnames.discard(dc)
-            self._dropcards.add(dc)
+        # universe. keep them around as list of dropped cards for reference.
+        # everything from here on is set algebra on sorted unique id arrays
+        deck_ids = _np.unique(_card_ids(self.cardnames))
+        self._dropcards = {_CARD_NAMES[i] for i in _np.setdiff1d(
+            deck_ids, universe_ids, assume_unique=True).tolist()}
+        for dc in self._dropcards:
+            _LOGGER.warning('card not in card universe: "%s"', dc)
 
         # TODO: left off here
-        nonland_cardnames = self.cardnames.intersection(
-            _CARD_UNIVERSE['no_lands'])
-        self.cardnames = _np.array(list(self.cardnames))
-        self.nonland_cardnames = _np.array(list(nonland_cardnames))
+        # the compliments (everything in the universe *not* in the deck) are
+        # built on first use below, as most decks are only ever sampled from
+        # their own cards
+        self.card_ids = _np.intersect1d(deck_ids, universe_ids,
+                                        assume_unique=True)
+        self.nonland_ids = _np.intersect1d(
+            self.card_ids, _universe_ids(_card_universe(True)),
+            assume_unique=True)
+        self.cardnames = card_names(self.card_ids)
+
+    @_functools.cached_property
+    def compliment_ids(self):
+        return _np.setdiff1d(self._universe_ids, self.card_ids,
+                             assume_unique=True)
+
+    @_functools.cached_property
+    def nonland_compliment_ids(self):
+        return _np.intersect1d(self.compliment_ids,
+                               _universe_ids(_card_universe(True)),
+                               assume_unique=True)
 
-        try:
-            compliment_cardnames = set(self.card_universe).difference(
-                self.cardnames)
-            nonland_compliment_cardnames = compliment_cardnames.intersection(
-                _CARD_UNIVERSE['no_lands'])
-            self.compliment_cardnames = _np.array(list(compliment_cardnames))
-            self.nonland_compliment_cardnames = _np.array(
-                list(nonland_compliment_cardnames))
-        except TypeError:
-            _LOGGER.debug('pretty big deck ya got there')
-            self.compliment_cardnames = _np.empty(1)
+    @property
+    def nonland_cardnames(self):
+        return card_names(self.nonland_ids)
+
+    @property
+    def compliment_cardnames(self):
+        return card_names(self.compliment_ids)
+
+    @property
+    def nonland_compliment_cardnames(self):
+        return card_names(self.nonland_compliment_ids)
 
     # card name cleanup functions
     def _clean_cards(self, cardnames):
-        """fix broken card names as needed, and create a list of all the cards
-        in the defined card universe that are not in the deck (the compliment)
+        """fix broken card names as needed, in a single pass over the deck
 
         """
-        cardnames = self._split_two_part_cards(cardnames)
-        cardnames = self._fix_weird_characters(cardnames)
-        cardnames = self._apply_generic_remapping(cardnames)
-        return cardnames
+        return {self._clean_card_name(c)
+                for cardname in cardnames
+                for c in self._split_two_part_card(cardname)}
 
-    def _split_two_part_cards(self, cardnames):
+    @staticmethod
+    def _split_two_part_card(cardname):
         """some systems refer to cards as A // B -- split those into two
         cards"""
-        return {c.strip()
-                for cardname in cardnames
-                for c in cardname.replace('//', '/').split('/')}
+        return cardname.replace('//', '/').split('/')
 
-    def _fix_weird_characters(self, cardnames):
-        """for now the only example is AE, but some systems display pairs of
-        characters oddly
+    @staticmethod
+    def _clean_card_name(cardname):
+        """strip whitespace, fix characters some systems display oddly (for now
+        the only example is AE), and apply the hard-coded replacements
 
         """
-        return {_.replace('AE', 'Ae') for _ in cardnames}
-
-    def _apply_generic_remapping(self, cardnames):
-        """a catch-all bucket for hard-coding some replacements"""
-        remap = {'Seance': 'Séance'}
-        return {remap.get(_, _) for _ in cardnames}
+        cardname = cardname.strip().replace('AE', 'Ae')
+        return _CARD_NAME_REMAP.get(cardname, cardname)
 
     # size and sampling properties
     @property
     def num_cards(self):
-        return self.cardnames.shape[0]
+        return self.card_ids.shape[0]
 
     @property
     def max_unique_pairs(self):
@@ -157,7 +390,25 @@ class Deck(object):
                no_lands=None, **kwargs):
         """sample cards from this deck and possible the compliment
 
-        this is a thin wrapper on np.random.choice. size is assumed to be of
+        a wrapper around `_choice_ids` which maps the sampled ids back to card
+        names; see that method for the arguments
+
+        returns:
+            np.ndarray: array of card names selected as declared
+
+        raises:
+            DeckError
+
+        """
+        return card_names(self._choice_ids(
+            size, n_in_deck=n_in_deck, n_not_in_deck=n_not_in_deck,
+            force_unique=force_unique, no_lands=no_lands, **kwargs))
+
+    def _choice_ids(self, size, n_in_deck=2, n_not_in_deck=0,
+                    force_unique=True, no_lands=None, **kwargs):
+        """sample card ids from this deck and possible the compliment
+
+        this is a thin wrapper on `Generator.choice`. size is assumed to be of
         size (n, n_in_deck + n_not_in_deck), where the first `n_in_deck` columns
         come from the deck and the next n_not_in_deck columns come from the
         compliment of the deck (card_universe - cardnames)
@@ -174,10 +425,10 @@ class Deck(object):
                 (default: True)
             no_lands (bool): whether or not we should exclude lands (default:
                 `self.ignore_lands`)
-            **kwargs: passed on to `np.choice` directly
+            **kwargs: `replace` and `p`, as in `Generator.choice`
 
         returns:
-            np.ndarray: array of card names selected as declared
+            np.ndarray: int32 array of card ids selected as declared
 
         raises:
             DeckError
@@ -185,6 +436,14 @@ class Deck(object):
         """
         # proper default for no_lands matches the constructor call
         no_lands = no_lands or self.ignore_lands
+        ids_in = self.nonland_ids if no_lands else self.card_ids
+
+        # hot path: unique, uniformly drawn pairs of two in-deck cards are what
+        # `DeckSampler` asks for most, and they never need the compliment
+        if (size[1] == 2 and n_in_deck == 2 and n_not_in_deck == 0
+                and force_unique and kwargs.get('p') is None
+                and kwargs.get('replace', True)):
+            return _unique_pairs(size[0], ids_in)
 
         # some sanity checks on the passed params
         if not n_in_deck + n_not_in_deck == size[1]:
@@ -197,72 +456,64 @@ class Deck(object):
             _LOGGER.warning('sampling only cards *not* in this deck, you'
                             ' probably want to sample all cards')
 
+        # the compliments are built lazily, so only touch them if we need them
+        if n_not_in_deck:
+            ids_not = (self.nonland_compliment_ids if no_lands
+                       else self.compliment_ids)
+
+        # weighted draws with replacement are repeated below with the same
+        # weights; validate them and build each cdf once for this call
+        cdf_in = cdf_not = None
+        if kwargs.get('p') is not None and kwargs.get('replace', True):
+            if n_in_deck:
+                cdf_in = _cdf(kwargs['p'], ids_in.shape[0])
+            if n_not_in_deck:
+                cdf_not = _cdf(kwargs['p'], ids_not.shape[0])
+
+        def draw(nrows):
+            """sample `nrows` rows of `n_in_deck` in-deck ids followed by
+            `n_not_in_deck` compliment ids into one preallocated buffer"""
+            c = _np.empty((nrows, size[1]), dtype=_np.int32)
+            if n_in_deck:
+                c[:, :n_in_deck] = _sample(ids_in, (nrows, n_in_deck),
+                                           cdf=cdf_in, **kwargs)
+            if n_not_in_deck:
+                c[:, n_in_deck:] = _sample(ids_not, (nrows, n_not_in_deck),
+                                           cdf=cdf_not, **kwargs)
+            return c
+
         # if we want all records to be unique, we simply iteratively add as many
         # records as remain, dedupe, and repeat until we are at the requested
         # size
         if force_unique:
-            # sanity check on the number of unique pairs (pairs sample is our
-            # most common use case right now)
+            # pairs are our most common use case by far; with uniform sampling
+            # we can draw distinct pairs directly instead of retrying
+            if (size[1] == 2 and kwargs.get('p') is None
+                    and kwargs.get('replace', True)):
+                if n_in_deck == 1:
+                    return _unique_pairs(size[0], ids_in, ids_not)
+                else:
+                    return _unique_pairs(size[0], ids_not)
+
+            # sanity check on the number of unique pairs
             if size[1] == 2 and size[0] > self.max_unique_pairs:
                 raise DeckError("can't uniquely sample that many cards")
 
-            # break the problem into two equal chunks for left and right cols
-            size_in = size[0], n_in_deck
-            size_not = size[0], n_not_in_deck
-
-            # build up our dataset in one or two steps
-            concatable = []
-            if n_in_deck:
-                c_in = _np.random.choice((self.nonland_cardnames
-                                          if no_lands else self.cardnames),
-                                         size_in, **kwargs)
-                concatable.append(c_in)
-
-            if n_not_in_deck:
-                c_not = _np.random.choice((self.nonland_compliment_cardnames
-                                           if no_lands
-                                           else self.compliment_cardnames),
-                                          size_not, **kwargs)
-                concatable.append(c_not)
-
-            # we built a list of one or two datasets in the two if statements
-            # above, now stitch them together side-by-side (columnwise). then,
-            # drop duplicates
-            c = _np.unique(_np.concatenate(concatable, axis=1), axis=0)
+            # build up our dataset in one step and drop duplicates
+            c = _unique_rows(draw(size[0]))
 
             # the above is either the number of records we requested (if all the
             # sampled pairs were unique) or less than what was requested. until
             # we've reached the required size, keep generating as many pairs as
             # are needed to round out the size, then dedupe, then repeat
             while c.shape[0] < size[0]:
-                size_remaining = (size[0] - c.shape[0], size[1])
-                size_in_remaining = size_remaining[0], n_in_deck
-                size_not_remaining = size_remaining[0], n_not_in_deck
-
-                concatable_remaining = []
-                if n_in_deck:
-                    c_in_remaining = _np.random.choice((self.nonland_cardnames
-                                                        if no_lands
-                                                        else self.cardnames),
-                                                       size_in_remaining,
-                                                       **kwargs)
-                    concatable_remaining.append(c_in_remaining)
-                if n_not_in_deck:
-                    c_not_remaining = _np.random.choice(
-                        (self.nonland_compliment_cardnames
-                         if no_lands else self.compliment_cardnames),
-                        size_not_remaining, **kwargs)
-                    concatable_remaining.append(c_not_remaining)
-
-                c_remaining = _np.concatenate(concatable_remaining, axis=1)
-
-                c = _np.unique(_np.concatenate((c, c_remaining), axis=0),
-                               axis=0)
+                c_remaining = draw(size[0] - c.shape[0])
+                c = _unique_rows(_np.concatenate((c, c_remaining), axis=0))
             return c
 
         # no unique, no problem. the world is a lot simpler
         else:
-            return _np.random.choice(self.cardnames, size, **kwargs)
+            return _sample(self.card_ids, size, **kwargs)
 
 
 def _get_decks(deckurls, decktype):
@@ -306,7 +557,10 @@ class DeckPool(object):
 
     @property
     def _dropcards(self):
-        return set.union(*(_._dropcards for _ in self.decks))
+        dropcards = set()
+        for deck in self.decks:
+            dropcards.update(deck._dropcards)
+        return dropcards
 
     @property
     def num_decks(self):
@@ -322,20 +576,93 @@ class DeckPool(object):
         up into even chunks among the different decks within
 
         """
+        return card_names(self._choice_ids(size, n_in_deck=n_in_deck,
+                                           n_not_in_deck=n_not_in_deck,
+                                           **kwargs))
+
+    def _choice_ids(self, size, n_in_deck=2, n_not_in_deck=0, **kwargs):
+        """`choice`, but returning card ids instead of card names"""
         chunksize = int(_np.ceil(size[0] / self.num_decks)), size[1]
-        _LOGGER.debug('chunksize = {}'.format(chunksize))
-        c = _np.empty((size), dtype='O')
+        _LOGGER.debug('chunksize = %s', chunksize)
+
+        # unique in-deck pairs (by far the most common request) are sampled for
+        # all decks at once
+        if (size[1] == 2 and n_in_deck == 2 and n_not_in_deck == 0
+                and kwargs.get('force_unique', True)
+                and kwargs.get('p') is None and kwargs.get('replace', True)):
+            c = self._in_deck_pair_ids(size[0], chunksize[0],
+                                       kwargs.get('no_lands'))
+            if c is not None:
+                return c
+
+        c = _np.empty((size), dtype=_np.int32)
         for (i, deck) in enumerate(self.decks):
             i0 = i * chunksize[0]
             i1 = min((i + 1) * chunksize[0], size[0])
-            _LOGGER.debug('i0, i1 = {}, {}'.format(i0, i1))
-            c[i0: i1] = deck.choice((i1 - i0, size[1]), n_in_deck=n_in_deck,
-                                    n_not_in_deck=n_not_in_deck, **kwargs)
+            _LOGGER.debug('i0, i1 = %s, %s', i0, i1)
+            c[i0: i1] = deck._choice_ids((i1 - i0, size[1]),
+                                         n_in_deck=n_in_deck,
+                                         n_not_in_deck=n_not_in_deck, **kwargs)
 
             if i1 == size[0]:
                 break
         return c
 
+    def _in_deck_pair_ids(self, nrows, chunksize, no_lands=None):
+        """unique pairs of two different in-deck cards for every deck at once
+
+        the first `chunksize` rows come from the first deck, the next from the
+        second, and so on, exactly as in the per-deck loop in `_choice_ids`.
+        all decks' ids are concatenated into one array, every row draws its two
+        positions within its own deck's segment in a single vectorized call,
+        and only the rows that repeat an earlier (deck, card, card) row are
+        redrawn
+
+        returns:
+            np.ndarray: (nrows x 2) int32 array of ids, or None if some deck is
+                asked for more than half of its possible pairs (where redrawing
+                converges slowly and the per-deck sampler does better)
+
+        raises:
+            DeckError
+
+        """
+        pools = [deck.nonland_ids if (no_lands or deck.ignore_lands)
+                 else deck.card_ids
+                 for deck in self.decks]
+        lens = _np.array([pool.shape[0] for pool in pools], dtype=_np.int64)
+        offsets = _np.concatenate(([0], _np.cumsum(lens)[:-1]))
+        allids = _np.concatenate(pools)
+
+        rowdeck = _np.arange(nrows) // max(chunksize, 1)
+        counts = _np.bincount(rowdeck, minlength=self.num_decks)
+        npairs = lens * (lens - 1)
+        if (counts > npairs).any():
+            raise DeckError("can't uniquely sample that many cards")
+        if (2 * counts > npairs).any():
+            return None
+
+        rowlens = lens[rowdeck]
+        rowoffsets = offsets[rowdeck]
+        ia = _np.empty(nrows, dtype=_np.int64)
+        ib = _np.empty(nrows, dtype=_np.int64)
+        todo = _np.arange(nrows)
+        while todo.size:
+            # draw two different positions within each row's own deck
+            a = _RNG.integers(0, rowlens[todo])
+            b = _RNG.integers(0, rowlens[todo] - 1)
+            b += b >= a
+            ia[todo] = rowoffsets[todo] + a
+            ib[todo] = rowoffsets[todo] + b
+
+            # positions are global, so (ia, ib) identifies deck and pair
+            keys = ia * allids.shape[0] + ib
+            isdupe = _np.ones(nrows, dtype=bool)
+            isdupe[_np.unique(keys, return_index=True)[1]] = False
+            todo = _np.flatnonzero(isdupe)
+
+        return _np.stack([allids[ia], allids[ib]], axis=1)
+
 
 class DeckSampler(object):
     """a random sampler for generating pairs of train and test records from a
@@ -378,19 +705,19 @@ class DeckSampler(object):
         nhalf = int(n * f_half)
         nfalse = n - ntrue - nhalf
 
-        names = _np.concatenate([self.deckpool.choice((ntrue, 2),
-                                                      replace=True,
-                                                      force_unique=True,
-                                                      no_lands=no_lands),
-                                 self.deckpool.choice((nhalf, 2), n_in_deck=1,
-                                                      n_not_in_deck=1,
-                                                      replace=True,
-                                                      force_unique=True,
-                                                      no_lands=no_lands),
-                                 self.allcards.choice((nfalse, 2), replace=True,
-                                                      force_unique=True,
-                                                      no_lands=no_lands), ],
-                                axis=0)
+        # fill one int32 buffer in place and look the names up once at the end
+        ids = _np.empty((n, 2), dtype=_np.int32)
+        ids[:ntrue] = self.deckpool._choice_ids((ntrue, 2), replace=True,
+                                                force_unique=True,
+                                                no_lands=no_lands)
+        ids[ntrue:ntrue + nhalf] = self.deckpool._choice_ids(
+            (nhalf, 2), n_in_deck=1, n_not_in_deck=1, replace=True,
+            force_unique=True, no_lands=no_lands)
+        ids[ntrue + nhalf:] = self.allcards._choice_ids((nfalse, 2),
+                                                        replace=True,
+                                                        force_unique=True,
+                                                        no_lands=no_lands)
+        names = card_names(ids)
 
         target = _np.zeros(n)
         target[:ntrue] = 1
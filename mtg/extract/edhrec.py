@@ -15,14 +15,28 @@ Usage:
 
 """
 
+import concurrent.futures
+import functools
 import logging
 import os
+import re
+import threading
 
+import numpy as np
 import pandas as pd
-import requests
 import tqdm
 
-from mtg import colors
+from mtg import colors, utils
+
+try:
+    import orjson as json
+except ImportError:
+    import json
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
 
 # ----------------------------- #
 #   Module Constants            #
@@ -35,84 +49,152 @@ logging.getLogger('urllib3').setLevel(logging.WARNING)
 EDH_REC_URL = 'https://edhrec.com/commanders'
 EDH_REC_S3_URL = 'https://edhrec-json.s3.amazonaws.com/en/commanders'
 
+# simdjson parsers are not thread-safe (and re-parsing invalidates the
+# documents they handed out), so each thread keeps its own
+_PARSERS = threading.local()
+
+_NUM_DECKS_RE = re.compile(r'(\d+) decks?')
+
 CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'mtg')
 F_EDHREC_CACHE = os.path.join(CACHE_DIR, 'edhrec.parquet')
+EDHREC_JSON_DIR = os.path.join(CACHE_DIR, 'edhrec')
 
 
 # ----------------------------- #
 #   Main routine                #
 # ----------------------------- #
 
-def get_commanders(s3url=EDH_REC_S3_URL):
+def get_commanders(s3url=EDH_REC_S3_URL, max_workers=32, forcerefresh=False):
     LOGGER.debug('getting commander summary info')
 
     def make_url(color_combo):
         return f"{s3url}/{''.join(color_combo).lower()}.json"
 
-    df = (pd.concat(objs=[_parse_edhrec_cardlist(url=make_url(color_combo))
-                          for color_combo
-                          in colors.ALL_COLOR_COMBOS_W_COLORLESS],
-                    ignore_index=True)
-          .reset_index(drop=True))
+    urls = [make_url(color_combo)
+            for color_combo in colors.ALL_COLOR_COMBOS_W_COLORLESS]
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as ex:
+        dfs = list(ex.map(functools.partial(_parse_edhrec_cardlist,
+                                            forcerefresh=forcerefresh),
+                          urls))
+
+    df = pd.concat(objs=dfs, ignore_index=True)
 
     # this will pull in commanders as well as staples. subset to commanders only
     df = df[df.is_commander]
-    df.loc[:, 'num_decks'] = (df
-                              .label
-                              .str.extract('(\d+) decks?', expand=False)
-                              .astype(int))
+    df = df.assign(num_decks=np.fromiter(
+        (int(_NUM_DECKS_RE.search(label).group(1)) for label in df.label),
+        dtype=np.int32,
+        count=df.shape[0]))
 
     return df
 
 
-def get_commander_summary(commander, s3url=EDH_REC_S3_URL):
-    LOGGER.debug(f'getting info for commander {commander}')
+def get_commander_summary(commander, s3url=EDH_REC_S3_URL,
+                          session=utils.SESSION, forcerefresh=False):
+    LOGGER.debug('getting info for commander %s', commander)
     url = f'{s3url}/{commander}.json'
-    return _parse_edhrec_cardlist(url)
+    return _parse_edhrec_cardlist(url, session=session,
+                                  forcerefresh=forcerefresh)
 
 
-def get_commanders_and_cards(s3url=EDH_REC_S3_URL, forcerefresh=False):
+def get_commanders_and_cards(s3url=EDH_REC_S3_URL, forcerefresh=False,
+                             max_workers=32):
     # if the local cache version doesn't exist, or forcerefresh is True, go
     # download the information and save it locally. otherwise, just return the
     # cached version
     if forcerefresh or not os.path.isfile(F_EDHREC_CACHE):
-        df_cmdrs = get_commanders(s3url)[['name', 'url', 'sanitized',
-                                          'scryfall_uri', 'num_decks']]
-        df_cmdrs.loc[:, 'commander_name'] = (df_cmdrs
-                                             .url
-                                             .str.extract('/commanders/(.*)',
-                                                          expand=False))
-        df_cmdrs.drop(['url'], axis=1, inplace=True)
-        df_cmdrs.drop_duplicates(inplace=True)
-
-        df = pd.DataFrame()
-        for (fullname, sanitized, scryfall_uri, num_decks, urlname) in tqdm.tqdm(df_cmdrs.values):
-            dfnow = get_commander_summary(urlname)
-
+        df_cmdrs = (get_commanders(s3url, max_workers=max_workers,
+                                   forcerefresh=forcerefresh)
+                    [['name', 'url', 'sanitized', 'scryfall_uri', 'num_decks']]
+                    .assign(commander_name=lambda d: (d
+                                                      .url
+                                                      .str.extract(
+                                                          '/commanders/(.*)',
+                                                          expand=False)))
+                    .drop(columns='url')
+                    .drop_duplicates())
+
+        # the per-commander downloads are independent, so keep several in
+        # flight at once over the shared pool of keep-alive connections
+        summary = functools.partial(get_commander_summary, s3url=s3url,
+                                    forcerefresh=forcerefresh)
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as ex:
+            summaries = list(tqdm.tqdm(ex.map(summary,
+                                              df_cmdrs.commander_name),
+                                       total=df_cmdrs.shape[0]))
+
+        dfs = []
+        for ((fullname, sanitized, scryfall_uri, num_decks, urlname),
+             dfnow) in zip(df_cmdrs.values, summaries):
             if dfnow.empty:
                 continue
 
-            dfnow = dfnow[['name', 'sanitized', 'scryfall_uri']].copy()
-            dfnow.loc[:, 'commander'] = fullname
-            dfnow.loc[:, 'commander_sanitized'] = sanitized
-            dfnow.loc[:, 'commander_scryfall_uri'] = scryfall_uri
-            dfnow.loc[:, 'num_decks'] = num_decks
-            df = pd.concat([df, dfnow], ignore_index=True)
+            dfs.append(dfnow[['name', 'sanitized', 'scryfall_uri']]
+                       .assign(commander=fullname,
+                               commander_sanitized=sanitized,
+                               commander_scryfall_uri=scryfall_uri,
+                               num_decks=num_decks))
 
-        df = df.reset_index(drop=True)
+        df = pd.concat(dfs, ignore_index=True)
 
         if not os.path.exists(CACHE_DIR):
             os.mkdir(CACHE_DIR)
-        df.to_parquet(F_EDHREC_CACHE, index=False)
+        df.to_parquet(F_EDHREC_CACHE, compression='zstd', index=False)
 
         return df
     else:
         return pd.read_parquet(F_EDHREC_CACHE)
 
 
-def _parse_edhrec_cardlist(url):
-    resp = requests.get(url)
-    j0 = resp.json()
+def _load_json(content):
+    """parse a json payload. when simdjson is available the result is a lazy
+    proxy, and python objects are only built for the keys we actually read
+
+    """
+    if simdjson is None:
+        return json.loads(content)
+    try:
+        parser = _PARSERS.parser
+    except AttributeError:
+        parser = _PARSERS.parser = simdjson.Parser()
+    return parser.parse(content)
+
+
+def _get_edhrec_json(url, session=utils.SESSION, forcerefresh=False):
+    """raw bytes of an edhrec json file, saved locally (one file per url) so
+    that re-runs, including ones resuming after a failure part way through,
+    don't re-download anything
+
+    args:
+        url (str): url of the json file
+        session (requests.Session): session for the download (default:
+            utils.SESSION)
+        forcerefresh (bool): whether or not we ignore the local copy (default:
+            False)
+
+    returns:
+        bytes: the json payload
+
+    raises:
+        None
+
+    """
+    localname = os.path.join(EDHREC_JSON_DIR, os.path.basename(url))
+    if not forcerefresh and os.access(localname, os.R_OK):
+        with open(localname, 'rb') as fp:
+            return fp.read()
+
+    LOGGER.debug('active download of url: %s', url)
+    resp = session.get(url)
+    # only keep successful responses around
+    if resp.ok:
+        utils.atomic_write(localname, [resp.content])
+    return resp.content
+
+
+def _parse_edhrec_cardlist(url, session=utils.SESSION, forcerefresh=False):
+    j0 = _load_json(_get_edhrec_json(url, session=session,
+                                     forcerefresh=forcerefresh))
     cardlists = j0['container']['json_dict']['cardlists']
 
     if cardlists is None:
@@ -133,24 +215,32 @@ def _parse_edhrec_cardlist(url):
         except KeyError:
             return None
 
-    return pd.DataFrame([{'cardlist_tag': cardlist['tag'],
-                          'url': card['url'],
-                          'label': card['label'],
-                          'name': card['name'],
-                          'price': ck_lookup(card, 'price'),
-                          'cardkingdom_url': ck_lookup(card, 'url'),
-                          'is_commander': card.get('is_commander'),
-                          'is_banned': card.get('banned'),
-                          'is_unofficial': card.get('unofficial'),
-                          'image': img_lookup(card),
-                          'legal_commander': card.get('legal_commander'),
-                          'legal_companion': card.get('legal_companion'),
-                          'legal_partner': card.get('legal_companion'),
-                          'sanitized': card.get('sanitized',
-                                                card.get('sanitized_wo')),
-                          'scryfall_uri': card.get('scryfall_uri'), }
-                         for cardlist in cardlists
-                         for card in cardlist['cardviews']])
+    cols = {k: [] for k in ['cardlist_tag', 'url', 'label', 'name', 'price',
+                            'cardkingdom_url', 'is_commander', 'is_banned',
+                            'is_unofficial', 'image', 'legal_commander',
+                            'legal_companion', 'legal_partner', 'sanitized',
+                            'scryfall_uri']}
+    for cardlist in cardlists:
+        tag = cardlist['tag']
+        for card in cardlist['cardviews']:
+            cols['cardlist_tag'].append(tag)
+            cols['url'].append(card['url'])
+            cols['label'].append(card['label'])
+            cols['name'].append(card['name'])
+            cols['price'].append(ck_lookup(card, 'price'))
+            cols['cardkingdom_url'].append(ck_lookup(card, 'url'))
+            cols['is_commander'].append(card.get('is_commander'))
+            cols['is_banned'].append(card.get('banned'))
+            cols['is_unofficial'].append(card.get('unofficial'))
+            cols['image'].append(img_lookup(card))
+            cols['legal_commander'].append(card.get('legal_commander'))
+            cols['legal_companion'].append(card.get('legal_companion'))
+            cols['legal_partner'].append(card.get('legal_companion'))
+            cols['sanitized'].append(card.get('sanitized',
+                                              card.get('sanitized_wo')))
+            cols['scryfall_uri'].append(card.get('scryfall_uri'))
+
+    return pd.DataFrame(cols)
 
 
 if __name__ == '__main__':
@@ -21,12 +21,18 @@ import os
 import time
 import yaml
 
+import lxml.etree
 import lxml.html
 import pandas as pd
 import requests
 
 from pandas.errors import EmptyDataError
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 from mtg.config import F_LOGGING_CONFIG
 
 # ----------------------------- #
@@ -35,8 +41,14 @@ from mtg.config import F_LOGGING_CONFIG
 
 LOGGER = logging.getLogger(__name__)
 with open(F_LOGGING_CONFIG, 'rb') as f:
-    logging.config.dictConfig(yaml.load(f))
-LOGGER.setLevel(logging.DEBUG)
+    logging.config.dictConfig(yaml.load(f, Loader=SafeLoader))
+
+# xpaths evaluated once per set page, compiled once here
+_PAPER_TABLE_XP = lxml.etree.XPath('.//div[@class="index-price-table-paper"]')
+_CARD_LINK_XP = lxml.etree.XPath('.//td[@class="card"]/a')
+
+# schema of the per-set price csvs written by `main`
+_CSV_DTYPES = {'px': 'float64', 'card_name': 'str', 'setcode': 'str'}
 
 
 # ----------------------------- #
@@ -50,7 +62,7 @@ def login(user, pw):
 
     # get the "authenticity token" value
     resp = session.get("https://www.mtggoldfish.com")
-    root = lxml.html.fromstring(resp.text)
+    root = lxml.html.fromstring(resp.content)
     at_form_xp = './/form[contains(@class, "layout-auth-identity-form")]'
     at_form = root.xpath(at_form_xp)[0]
 
@@ -74,28 +86,17 @@ def set_urls(session=None):
     """generator of urls for different mtg card sets (limit to modern)"""
     session = session or requests
     resp = session.get("https://www.mtggoldfish.com/prices/select")
-    root = lxml.html.fromstring(resp.text)
+    root = lxml.html.fromstring(resp.content)
     modern_div_xp = './/div[contains(@class, "priceList-setMenu-Modern")]'
     modern_div = root.xpath(modern_div_xp)[0]
     for url in modern_div.xpath('./li[@role="presentation"]/a/@href'):
         if url.startswith('/index') and not url.endswith('modern'):
             setcode = url[-3:]
             seturl = 'https://www.mtggoldfish.com{}#paper'.format(url)
-            LOGGER.info('set {} @ {}'.format(setcode, seturl))
+            LOGGER.info('set %s @ %s', setcode, seturl)
             yield (setcode, seturl)
 
 
-@functools.lru_cache(maxsize=None)
-def card_urls(seturl, session=None):
-    """list of urls for different cards keyed off of setlists"""
-    session = session or requests
-    resp = session.get(seturl)
-    root = lxml.html.fromstring(resp.text)
-    paper_table = root.xpath('.//div[@class="index-price-table-paper"]')[0]
-    return ['https://www.mtggoldfish.com{}'.format(url)
-            for url in paper_table.xpath('.//td[@class="card"]/a/@href')]
-
-
 def _clean_name(n):
     return n.replace('(', '<').replace(')', '>').replace('//', '%2F%2F')
 
@@ -106,10 +107,10 @@ def card_urls(seturl, setcode, session=None):
     session = session or requests
     csvfmt = 'https://www.mtggoldfish.com/price-download/paper/{} [{}]'
     resp = session.get(seturl)
-    root = lxml.html.fromstring(resp.text)
-    paper_table = root.xpath('.//div[@class="index-price-table-paper"]')[0]
+    root = lxml.html.fromstring(resp.content)
+    paper_table = _PAPER_TABLE_XP(root)[0]
     return [(elem.text, csvfmt.format(_clean_name(elem.text), setcode))
-            for elem in paper_table.xpath('.//td[@class="card"]/a')]
+            for elem in _CARD_LINK_XP(paper_table)]
 
 
 @functools.lru_cache(maxsize=None)
@@ -117,7 +118,7 @@ def get_prices(url, session=None, throttle_pause=0.0):
     """given a url for a card, parse the price history as a dataframe"""
     session = session or requests
     time.sleep(throttle_pause)
-    LOGGER.debug('obtaining pxs for {}'.format(url))
+    LOGGER.debug('obtaining pxs for %s', url)
     resp = session.get(url)
     try:
         df = pd.DataFrame([dict(zip(['px_date', 'px'], line.split(',')))
@@ -126,7 +127,7 @@ def get_prices(url, session=None, throttle_pause=0.0):
         # some cards *exist* but have no prices (e.g. Ajani, Valiant Protector
         # in AER only exists in foil, but you can download non-foil prices)
         if df.empty:
-            LOGGER.warning('no prices for {}'.format(os.path.basename(url)))
+            LOGGER.warning('no prices for %s', os.path.basename(url))
             return df
 
         # otherwise, merry way
@@ -139,26 +140,25 @@ def get_prices(url, session=None, throttle_pause=0.0):
         if resp.text.strip() == 'Throttled':
             throttle_pause = max(throttle_pause * 2, 30)
             LOGGER.debug('throttled')
-            LOGGER.debug(
-                'increasing throttle pause to {}'.format(throttle_pause))
+            LOGGER.debug('increasing throttle pause to %s', throttle_pause)
             return get_prices(url, session, throttle_pause)
         raise
 
 
 def load_from_csv(csvdir='.'):
     """given csvdir, load contents of mtg sets into a dataframe"""
-    df = pd.DataFrame()
+    dfs = []
     for basename in os.listdir(csvdir):
-        LOGGER.debug("loading {}".format(basename))
+        LOGGER.debug("loading %s", basename)
         try:
-            dfnow = pd.read_csv(os.path.join(csvdir, basename),
-                                parse_dates=['px_date'])
-            df = df.append(dfnow, ignore_index=True)
+            dfs.append(pd.read_csv(os.path.join(csvdir, basename),
+                                   dtype=_CSV_DTYPES,
+                                   parse_dates=['px_date']))
         except EmptyDataError:
-            LOGGER.debug("csv {} was empty".format(basename))
+            LOGGER.debug("csv %s was empty", basename)
 
     LOGGER.debug("loaded all files")
-    df = df.reset_index(drop=True)
+    df = pd.concat(dfs, ignore_index=True)
 
     LOGGER.debug("converting name and set into categories")
     df.card_name = df.card_name.astype('category')
@@ -185,23 +185,22 @@ def main(user, pw, csvdir='.', force_refresh=False):
     for setcode, seturl in set_urls(session=session):
         fcsv = os.path.join(csvdir, "{}.csv".format(setcode))
         if os.path.isfile(fcsv) and not force_refresh:
-            LOGGER.debug('results cached for set {}'.format(setcode))
+            LOGGER.debug('results cached for set %s', setcode)
             continue
 
-        df = pd.DataFrame()
+        dfs = []
         for (cardname, cardurl) in card_urls(seturl, setcode, session=session):
             dfnow = get_prices(cardurl, session=session)
             # skip empty cards (successfully parsed but not priced)
             if dfnow.empty:
                 continue
-            dfnow.loc[:, 'card_name'] = cardname
-            df = df.append(dfnow, ignore_index=True)
+            dfs.append(dfnow.assign(card_name=cardname))
+        df = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
 
         # non-foil masterpiece sets exist but are empty
         if df.empty:
-            LOGGER.warning('set {} has no cards in it'.format(setcode))
+            LOGGER.warning('set %s has no cards in it', setcode)
         else:
             df.loc[:, 'setcode'] = setcode
-        df = df.reset_index(drop=True)
 
         df.to_csv(fcsv, header=True, index=False)
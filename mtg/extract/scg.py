@@ -19,6 +19,7 @@ import json
 import logging
 import re
 
+import lxml.etree
 import lxml.html
 import requests
 import tqdm
@@ -33,11 +34,45 @@ from datetime import datetime
 
 RESULT_REGEX = (r'^(?P<finish>\d+)(?:th|rd|st) place at [\w ]+ on'
                 r' (?P<date>\d{1,2}/\d{1,2}/\d{2,4})$')
+_RESULT_RE = re.compile(RESULT_REGEX)
 DECK_URL = 'http://sales.starcitygames.com//deckdatabase/deckshow.php'
 SCG_SESSION = None
 
 LOGGER = logging.getLogger(__name__)
 
+# the css selectors we use, translated to xpath (as `.cssselect` would, but
+# without needing the cssselect package) and compiled once here. the original
+# selector is noted above each one
+_CLASS_XP = ("descendant-or-self::*[@class and contains(@class, '{0}') and"
+             " contains(concat(' ', normalize-space(@class), ' '), ' {0} ')]")
+
+# .player_name a
+_PLAYER_NAME_XP = lxml.etree.XPath(
+    _CLASS_XP.format('player_name') + '/descendant::a')
+# .deck_title a
+_DECK_TITLE_XP = lxml.etree.XPath(
+    _CLASS_XP.format('deck_title') + '/descendant::a')
+# .deck_played_placed
+_RESULT_XP = lxml.etree.XPath(_CLASS_XP.format('deck_played_placed'))
+# .decklist_heading+ ul li
+_MAINBOARD_XP = lxml.etree.XPath(
+    _CLASS_XP.format('decklist_heading')
+    + '/following-sibling::*[(self::ul) and (position() = 1)]/descendant::li')
+# .deck_sideboard li
+_SIDEBOARD_XP = lxml.etree.XPath(
+    _CLASS_XP.format('deck_sideboard') + '/descendant::li')
+# #content strong
+_DECKLINK_XP = lxml.etree.XPath(
+    "descendant-or-self::*[@id = 'content']/descendant::strong")
+# .deckdbbody2:nth-child(4) , .deckdbbody:nth-child(4)
+_EVENTTYPE_XP = lxml.etree.XPath(
+    ' | '.join('{}[count(preceding-sibling::*) = 3]'.format(
+        _CLASS_XP.format(cls)) for cls in ['deckdbbody2', 'deckdbbody']))
+# tr:nth-child(106) a
+_URL_BLOCK_XP = lxml.etree.XPath(
+    'descendant-or-self::tr[count(preceding-sibling::*) = 105]'
+    '/descendant::a')
+
 
 # ----------------------------- #
 #   utility functions           #
@@ -109,8 +144,7 @@ class ScgDeck(decks.Deck):
     def author(self):
         if self._author is None:
             try:
-                self._author = (self.root
-                                .cssselect('.player_name a')
+                self._author = (_PLAYER_NAME_XP(self.root)
                                 [0]
                                 .text
                                 .lower())
@@ -122,8 +156,7 @@ class ScgDeck(decks.Deck):
     def authorurl(self):
         if self._authorurl is None:
             try:
-                self._authorurl = (self.root
-                                   .cssselect('.player_name a')
+                self._authorurl = (_PLAYER_NAME_XP(self.root)
                                    [0]
                                    .get('href'))
             except:
@@ -134,8 +167,7 @@ class ScgDeck(decks.Deck):
     def name(self):
         if self._name is None:
             try:
-                self._name = (self.root
-                              .cssselect('.deck_title a')
+                self._name = (_DECK_TITLE_XP(self.root)
                               [0]
                               .text
                               .lower())
@@ -147,7 +179,7 @@ class ScgDeck(decks.Deck):
     def resultelem(self):
         if self._resultelem is None:
             try:
-                self._resultelem = self.root.cssselect('.deck_played_placed')[0]
+                self._resultelem = _RESULT_XP(self.root)[0]
             except:
                 raise ScgDeckParseError("can't find result element")
         return self._resultelem
@@ -168,8 +200,8 @@ class ScgDeck(decks.Deck):
     def resultregmatch(self):
         if self._resultregmatch is None:
             try:
-                self._resultregmatch = (re.search(RESULT_REGEX,
-                                                  self.resulttext)
+                self._resultregmatch = (_RESULT_RE
+                                        .search(self.resulttext)
                                         .groupdict())
             except:
                 raise ScgDeckParseError("can't regex parse result text")
@@ -217,7 +249,7 @@ class ScgDeck(decks.Deck):
         if self._mainboard is None:
             try:
                 self._mainboard = {}
-                for cardrow in self.root.cssselect('.decklist_heading+ ul li'):
+                for cardrow in _MAINBOARD_XP(self.root):
                     qty = int(cardrow.text.lower().strip())
                     card = cardrow.find('a').text.lower()
                     self._mainboard[card] = qty
@@ -230,7 +262,7 @@ class ScgDeck(decks.Deck):
         if self._sideboard is None:
             try:
                 self._sideboard = {}
-                for cardrow in self.root.cssselect('.deck_sideboard li'):
+                for cardrow in _SIDEBOARD_XP(self.root):
                     qty = int(cardrow.text.lower().strip())
                     card = cardrow.find('a').text.lower()
                     self._sideboard[card] = qty
@@ -301,9 +333,8 @@ def scg_decklist_urls(include_test=False):
     for urlblock in tqdm.tqdm(scg_url_blocks()):
         resp = SCG_SESSION.get(urlblock)
         root = lxml.html.fromstring(resp.content)
-        decklinks = root.cssselect('#content strong')
-        eventtypes_css = '.deckdbbody2:nth-child(4) , .deckdbbody:nth-child(4)'
-        eventtypes = root.cssselect(eventtypes_css)
+        decklinks = _DECKLINK_XP(root)
+        eventtypes = _EVENTTYPE_XP(root)
         if len(decklinks) != len(eventtypes):
             err = "Unequal numbers of decks and decktypes on block url {}"
             err = err.format(urlblock)
@@ -318,5 +349,5 @@ def scg_url_blocks():
     resp = SCG_SESSION.get(url=DECK_URL, params={'limit': 100})
     root = lxml.html.fromstring(resp.content)
     return [a.attrib['href'].replace('&limit=limit', '')
-            for a in root.cssselect('tr:nth-child(106) a')
+            for a in _URL_BLOCK_XP(root)
             if 'Next' not in a.text]
@@ -16,33 +16,69 @@ Usage:
 """
 
 import collections as _collections
+import concurrent.futures as _futures
 import functools
 import logging as _logging
 import os as _os
 import re as _re
 
+import lxml.etree as _etree
 import lxml.html as _html
 import numpy as _np
 import networkx as _nx
 import pandas as _pd
 import requests as _requests
 
+from html import unescape as _unescape
 from json.decoder import JSONDecodeError as _JSONDecodeError
 
-from mtg import cards, decks, tags
+from mtg import cards, decks, tags, utils
 
 # ----------------------------- #
 #   Module Constants            #
 # ----------------------------- #
 
 _LOGGER = _logging.getLogger(__name__)
-_LOGGER.setLevel(_logging.DEBUG)
 
 _URL = 'http://tappedout.net/api/inventory/{owner:}/board/'
 _FIELDNAMES = ['Name', 'Edition', 'Qty', 'Foil', ]
 _FNAME = _os.path.join(_os.sep, 'tmp', 'mtg_inventory.csv')
 _SESS = _requests.Session()
 
+# tappedout inventories and decks change, but not by the minute; keep local
+# copies of what we fetch for a day
+_CACHE_TTL = 24 * 60 * 60
+
+# inventory pages requested at once by default
+_INVENTORY_WORKERS = 8
+
+# xpaths evaluated for every deck page (and every category on it), compiled
+# once here
+_CATEGORY_HEADER_XP = _etree.XPath(
+    './/div[contains(@class, "board-col")]//h3')
+_CATEGORY_CARD_XP = _etree.XPath('./li/a')
+
+# the inventory api returns small html fragments for every record; these are
+# simple enough to pick apart without building an lxml tree for each one
+_ANCHOR_RE = _re.compile(r'<a\b[^>]*>', _re.I)
+_DATA_ATTR_RE = _re.compile(r'\bdata-([\w-]+)="([^"]*)"')
+_TAG_RE = _re.compile(r'<[^>]*>')
+
+# prefixes stripped from every tag name when mapping tags to categories
+_TAG_PREFIX_RE = _re.compile('mtg:?|deck_categories:?')
+
+# the " - " / " \u2014 " between a type line's types and its subtypes
+_TYPE_SEP_RE = _re.compile(' [-\u2014] ')
+
+# type prefixes folded away when grouping the binder by type, matched in one
+# pass
+_BINDER_TYPE_MAP = {'Artifact Land': 'Land',
+                    'Basic Land': 'Land',
+                    'Enchantment ': '',
+                    'Tribal ': '',
+                    'Legendary ': '', }
+_BINDER_TYPE_RE = _re.compile('|'.join(map(_re.escape, _BINDER_TYPE_MAP)))
+
 
 class TappedOutError(Exception):
     pass
@@ -52,6 +88,32 @@ class TappedOutError(Exception):
 #   generic functions           #
 # ----------------------------- #
 
+def _anchor_data_attrs(fragment):
+    """the data-* attributes of the first <a> tag in an html fragment, keyed by
+    the name without its "data-" prefix
+
+    """
+    anchor = _ANCHOR_RE.search(fragment)
+    if anchor:
+        anchor = anchor.group(0)
+        attrs = _DATA_ATTR_RE.findall(anchor)
+        # only trust the regex if it read every data- attribute in the tag
+        if attrs and len(attrs) == anchor.lower().count('data-'):
+            return {k: _unescape(v) for (k, v) in attrs}
+
+    # anything the regexes can't handle (single quotes, upper case, ...) gets
+    # a real parse
+    carddetails = _html.fromstring(fragment).find('.//a').attrib
+    return {k.replace('data-', ''): v
+            for (k, v) in carddetails.items()
+            if k.startswith('data-')}
+
+
+def _fragment_text(fragment):
+    """text content of an html fragment"""
+    return _unescape(_TAG_RE.sub('', fragment))
+
+
 @functools.lru_cache()
 def _get_inventory_page(url, pagelength, start):
     resp = _SESS.get(url, params={'pagelength': pagelength, 'start': start})
@@ -62,63 +124,117 @@ def _get_inventory_page(url, pagelength, start):
         raise
 
 
+@functools.lru_cache(maxsize=None)
+def _mtgjson_index():
+    """mtgjson card data keyed for the inventory join (one row per (name,
+    set), last printing wins). built once per process and shared by every
+    caller -- treat it as read-only
+
+    """
+    return (cards.cards_df()
+            .assign(_key_name=lambda d: d['name'],
+                    _key_set=lambda d: d['setname'])
+            .drop_duplicates(['_key_name', '_key_set'], keep='last'))
+
+
+def get_inventory(url=_URL, owner='ndlambo', pagelength=50, max_workers=None):
+    """simple inventory getter, as a dataframe with one row per inventory
+    record (do not modify the returned frame; it is memoized -- see
+    `df_inventory` for a copy)
+
+    args:
+        url (str): inventory api url template (default: _URL)
+        owner (str): tappedout user name (default: 'ndlambo')
+        pagelength (int): records requested per page (default: 50)
+        max_workers (int): maximum number of pages requested at once
+            (default: _INVENTORY_WORKERS)
+
+    returns:
+        pd.DataFrame: the inventory
+
+    """
+    global _INVENTORY_WORKERS
+    # the thread count is deliberately not an argument of the cached function
+    # (it would be part of the cache key), so override the module default for
+    # the duration of this call instead
+    default_workers = _INVENTORY_WORKERS
+    if max_workers is not None:
+        _INVENTORY_WORKERS = max_workers
+    try:
+        return _get_inventory(url, owner, pagelength)
+    finally:
+        _INVENTORY_WORKERS = default_workers
+
+
 @functools.lru_cache()
-def get_inventory(url=_URL, owner='ndlambo', pagelength=50):
-    """simple inventory json getter"""
+@utils.file_cache(ttl=_CACHE_TTL)
+def _get_inventory(url, owner, pagelength):
     inventory = []
+    max_workers = _INVENTORY_WORKERS
 
     url = url.format(owner=owner)
     start = 0
-
-    while True:
-        j = _get_inventory_page(url, pagelength, start)
-
-        # j['data'] is a possibly-empty list. iterate until it's empty.
-        if j['data']:
-            inventory += j['data']
-            start += pagelength
-            _LOGGER.debug('collected {} records so far'.format(len(inventory)))
-        else:
-            break
-
-    # we get a bit of extra information from the mtgjson site we'd like to join
-    # in (specifically, cmc and color identity), so pivot that out into a more
-    # useful lookup dict
-    mtgjson = {(card.get('name'), card.get('setname')): card
-               for card in cards.get_cards()}
+    get_page = functools.partial(_get_inventory_page, url, pagelength)
+
+    # j['data'] is a possibly-empty list. we don't know how many pages there
+    # are up front, so request the next `max_workers` pages at once and keep
+    # going until one of them comes back empty
+    with _futures.ThreadPoolExecutor(max_workers) as ex:
+        exhausted = False
+        while not exhausted:
+            starts = range(start, start + max_workers * pagelength, pagelength)
+            for j in ex.map(get_page, starts):
+                if not j['data']:
+                    exhausted = True
+                    break
+                inventory += j['data']
+                _LOGGER.debug('collected %s records so far', len(inventory))
+            start = starts[-1] + pagelength
 
     # do some parsing of the html elements returned (because we can't just get
     # names, I guess).
     for record in inventory:
         record['qty'] = record['amount']['qty']
-        carddetails = _html.fromstring(record['card']).find('.//a').attrib
-        record.update({k.replace('data-', ''): v
-                       for (k, v) in carddetails.items()
-                       if k.startswith('data-')})
+        record.update(_anchor_data_attrs(record['card']))
         record.update(record['edit'])
-        price = _html.fromstring(record['market_price']).text_content()
+        price = _fragment_text(record['market_price'])
         try:
             record['px'] = float(price)
         except:
             record['px'] = None
 
-        try:
-            set = 'PRM' if record['set'] == '000' else record['set']
-            record.update(mtgjson[record['name'], set])
-        except:
-            pass
+    df = _pd.DataFrame(inventory)
+    if df.empty:
+        return df
 
-    return inventory
+    # we get a bit of extra information from the mtgjson site we'd like to join
+    # in (specifically, cmc and color identity). join on (name, set) in one
+    # merge; records whose set is not a plain string (some are lists) simply
+    # won't match anything. the last printing wins for duplicate keys
+    mtgjson = _mtgjson_index()
+    keys = _pd.DataFrame({'_key_name': df['name'].astype(str),
+                          '_key_set': (df['set']
+                                       .where(df['set'] != '000', 'PRM')
+                                       .astype(str))})
+    matched = (keys
+               .merge(mtgjson, how='left', on=['_key_name', '_key_set'])
+               .drop(columns=['_key_name', '_key_set']))
+    matched.index = df.index
+
+    # mtgjson values win wherever a record matched
+    newcols = [col for col in matched.columns if col not in df.columns]
+    return matched.combine_first(df)[list(df.columns) + newcols]
 
 
 def df_inventory(url=_URL, owner='ndlambo', pagelength=500):
-    return _pd.DataFrame(get_inventory(url, owner, pagelength))
+    return get_inventory(url, owner, pagelength).copy()
 
 
 # ----------------------------- #
 # deck-specific information     #
 # ----------------------------- #
 
+@utils.file_cache(ttl=_CACHE_TTL)
 def _get_deck_df(deckid):
     deckurl = 'http://tappedout.net/mtg-decks/{}/?fmt=csv'.format(deckid)
     try:
@@ -182,6 +298,36 @@ class TappedoutDeck(decks.Deck):
 # tags                          #
 # ----------------------------- #
 
+def _board_container(resp):
+    """the first board-container div (in document order, so the outermost one
+    if they are nested) of a (streamed) deck page response. parsing, and the
+    download itself, stop as soon as that div is complete rather than building
+    the tree for the whole page
+
+    """
+    parser = _etree.HTMLPullParser(events=('start', 'end'), tag='div')
+    container = None
+
+    def events():
+        for chunk in resp.iter_content(chunk_size=1 << 16):
+            parser.feed(chunk)
+            yield from parser.read_events()
+        parser.close()
+        yield from parser.read_events()
+
+    # remember the first matching div when it opens, and hand it back once it
+    # closes (nested divs close, and so fire their end events, before it does)
+    for (event, elem) in events():
+        if container is None:
+            if (event == 'start'
+                    and 'board-container' in elem.get('class', '')):
+                container = elem
+        elif event == 'end' and elem is container:
+            return container
+    raise TappedOutError("couldn't find the board container on the deck page")
+
+
+@utils.file_cache(ttl=_CACHE_TTL)
 def get_categories(deckid):
     """given a tappedout deck id, get all tagged custom categories for that deck
 
@@ -191,15 +337,12 @@ def get_categories(deckid):
         deckid (str): tappedout.net deck id
 
     """
-    resp = _requests.get('http://tappedout.net/mtg-decks/{}/'.format(deckid),
-                         params={'cat': 'custom'})
-    root = _html.fromstring(resp.text)
-    mbc_xp = './/div[contains(@class, "board-container")]'
-    mainboard_container = root.xpath(mbc_xp)[0]
+    with _requests.get('http://tappedout.net/mtg-decks/{}/'.format(deckid),
+                       params={'cat': 'custom'}, stream=True) as resp:
+        mainboard_container = _board_container(resp)
     categories = _collections.defaultdict(list)
 
-    cd_xp = './/div[contains(@class, "board-col")]//h3'
-    for cat_div in mainboard_container.xpath(cd_xp):
+    for cat_div in _CATEGORY_HEADER_XP(mainboard_container):
         category = '#{}'.format(cat_div
                                 .text
                                 .strip()
@@ -210,7 +353,7 @@ def get_categories(deckid):
         if category == '#other':
             continue
         cat_ul = cat_div.getnext()
-        cardnames = [_.attrib['data-name'] for _ in cat_ul.xpath('./li/a')]
+        cardnames = [_.attrib['data-name'] for _ in _CATEGORY_CARD_XP(cat_ul)]
         for cardname in cardnames:
             categories[cardname].append(category)
 
@@ -233,9 +376,8 @@ def tappedout_categories_to_tags(deckid, categories):
 
     # let's handle the mapping between tappedout categories and tags.
     def tagname_to_cat(tagname):
-        cat = _re.sub('mtg:?', '', tagname)
-        cat = _re.sub('deck_categories:?', '', cat)
-        cat = _re.sub(':', '_', cat)
+        cat = _TAG_PREFIX_RE.sub('', tagname)
+        cat = cat.replace(':', '_')
         cat = '#{}'.format(cat)
         return cat
 
@@ -296,26 +438,25 @@ def binder_summary(url=_URL, owner='ndlambo', bulkthresh=0.30, mainthresh=1.00):
     keepkeys = ['name', 'qty', 'foil', 'px', 'tla', 'type', 'tcg-foil-price',
                 'colorIdentity', 'power', 'toughness', 'convertedManaCost',
                 'set', 'other_collections']
-    inventory = _pd.DataFrame(get_inventory(url, owner))[keepkeys]
+    inventory = get_inventory(url, owner)[keepkeys]
 
     # sets are annoying; could be strings or lists. fix
-    def fix_set(s):
-        return s if isinstance(s, str) else s[0]
-
-    inventory.loc[:, 'set'] = (inventory
-                               ['set']
-                               .apply(fix_set))
+    # (.astype(object) throughout: an all-NaN column comes back as float64,
+    # which has no .str accessor)
+    sets = inventory['set'].astype(object)
+    inventory.loc[:, 'set'] = sets.where(sets.map(type).eq(str), sets.str[0])
 
     # power and toughness are numbers, *s and NaNs. replace *s with infs and
-    # the category is already ordered
-    def tryfloat(x):
-        try:
-            return float(x.replace('*', 'inf'))
-        except (ValueError, AttributeError):
-            return x
+    # the category is already ordered. anything that still won't parse (e.g.
+    # '1+*') is kept as-is
+    def tryfloat(col):
+        col = col.astype(object)
+        num = _pd.to_numeric(col.str.replace('*', 'inf', regex=False),
+                             errors='coerce')
+        return num.where(num.notnull(), col)
 
-    inventory.loc[:, 'power'] = inventory.power.apply(tryfloat)
-    inventory.loc[:, 'toughness'] = inventory.toughness.apply(tryfloat)
+    inventory.loc[:, 'power'] = tryfloat(inventory.power)
+    inventory.loc[:, 'toughness'] = tryfloat(inventory.toughness)
 
     inventory.power = inventory.power.astype('category')
     inventory.toughness = inventory.toughness.astype('category')
@@ -362,13 +503,10 @@ def binder_summary(url=_URL, owner='ndlambo', bulkthresh=0.30, mainthresh=1.00):
 
     # order also depends on number of colors involved in casting; create an
     # ordered category for this
-    def colorstr(rec):
-        try:
-            return ''.join(sorted(rec))
-        except TypeError:
-            return ''
-
-    inventory.loc[:, 'colorstr'] = inventory.colorIdentity.apply(colorstr)
+    # join first, then sort only the handful of distinct color strings
+    joined = inventory.colorIdentity.astype(object).str.join('')
+    colorstr = {s: ''.join(sorted(s)) for s in joined.dropna().unique()}
+    inventory.loc[:, 'colorstr'] = joined.map(colorstr).fillna('')
     inventory.colorstr = inventory.colorstr.astype('category')
 
     def color_category_order(cat):
@@ -400,20 +538,15 @@ def binder_summary(url=_URL, owner='ndlambo', bulkthresh=0.30, mainthresh=1.00):
     # ditto for type
     inventory.loc[:, 'mytype'] = (inventory
                                   .type
-                                  .str.replace('\u2014', '-')
-                                  .str.replace(' - ', '|')
+                                  .str.replace(_TYPE_SEP_RE, '|', regex=True)
                                   .str.extract('([^|]+)', expand=False))
 
-    inventory.replace({'mytype': {'Artifact Land': 'Land',
-                                  'Basic Land': 'Land',
-                                  'Enchantment ': '',
-                                  'Tribal ': '',
-                                  'Legendary ': '',
-                                  'Legendary Enchantment ': '', }, },
-                      inplace=True,
-                      regex=True)
-
-    inventory.mytype = inventory.mytype.astype('category')
+    # there are only a few dozen distinct types, so substitute once for each
+    # of those rather than once per row
+    mytypes = {t: _BINDER_TYPE_RE.sub(lambda m: _BINDER_TYPE_MAP[m.group(0)],
+                                      t)
+               for t in inventory.mytype.dropna().unique()}
+    inventory.mytype = inventory.mytype.map(mytypes).astype('category')
 
     def type_category_order(cat):
         """type order within the binder"""
@@ -14,10 +14,11 @@ Usage:
 
 """
 
+import concurrent.futures
 import logging
 import re
 
-import requests
+from mtg import utils
 
 # ----------------------------- #
 #   Module Constants            #
@@ -29,55 +30,98 @@ logger = logging.getLogger(__name__)
 logging.getLogger('requests').setLevel(logging.WARN)
 logging.getLogger('urllib3').setLevel(logging.WARN)
 
+WIKI_API_URL = 'https://mtg.gamepedia.com/api.php'
+
+# keyword reminder text changes rarely; re-scrape it once a week
+_CACHE_TTL = 7 * 24 * 60 * 60
+
+# keyword pages downloaded at once by default
+_MAX_WORKERS = 16
+
+# applied to the infobox of every keyword page
+_REMINDER_RE = re.compile(r'\| reminder = (.*)', re.I)
+
 
 # ----------------------------- #
 #   Main routine                #
 # ----------------------------- #
 
-def _keyword_urls():
+def _keyword_urls(session=utils.SESSION):
     # two categories: keyword actions and keyword abilities
     for templatename in ['Template:Infobox action', 'Template:Infobox keyword']:
-        url = 'https://mtg.gamepedia.com/api.php'
-        resp = requests.get(url,
-                            params={'action': 'query',
-                                    'list': 'embeddedin',
-                                    'eititle': templatename,
-                                    'eilimit': 1000,
-                                    'format': 'json'})
+        resp = session.get(WIKI_API_URL,
+                           params={'action': 'query',
+                                   'list': 'embeddedin',
+                                   'eititle': templatename,
+                                   'eilimit': 1000,
+                                   'format': 'json'})
         j = resp.json()
         for item in j['query']['embeddedin']:
             yield item
 
 
-def reminder_text():
+def _keyword_reminder_text(kwdict, session=utils.SESSION):
+    """(keyword, reminder text) for one keyword page; the reminder text is None
+    when the page has none or could not be parsed
+
+    """
+    kwname = kwdict['title'].lower()
+    kwid = kwdict['pageid']
+    try:
+        resp = session.get(url=WIKI_API_URL,
+                           params={'action': 'parse',
+                                   'pageid': kwid,
+                                   'prop': 'wikitext',
+                                   'format': 'json'})
+        infobox = resp.json()['parse']['wikitext']['*']
+
+        remtextnow = _REMINDER_RE.search(infobox)
+        remtextnow = remtextnow.groups()[0].lower()
+        if remtextnow[-1] == '.':
+            remtextnow = remtextnow[:-1]
+
+        logger.debug('SUCCESS: %s', kwname)
+        return kwname, remtextnow
+    except AttributeError:
+        logger.debug('SUCCESS: %s (no reminder text)', kwname)
+    except Exception as e:
+        logger.warning('FAILURE: %s', kwname)
+        logger.debug('\texception: %s', e)
+    return kwname, None
+
+
+def reminder_text(forcerefresh=False, max_workers=None):
     """get a dictionary of keyword: reminder text values (useful for text
-    analytics)
+    analytics). the results are cached locally for a week after each scrape
+
+    args:
+        forcerefresh (bool): whether or not we ignore the local copy
+            (default: False)
+        max_workers (int): maximum number of keyword pages downloaded at once
+            when we do scrape (default: _MAX_WORKERS)
 
     """
-    remtext = {}
-    for kwdict in _keyword_urls():
-        kwname = kwdict['title'].lower()
-        kwid = kwdict['pageid']
-        try:
-            resp = requests.get(url='https://mtg.gamepedia.com/api.php',
-                                params={'action': 'parse',
-                                        'pageid': kwid,
-                                        'prop': 'wikitext',
-                                        'format': 'json'})
-            infobox = resp.json()['parse']['wikitext']['*']
-
-            remtextnow = re.search('\| reminder = (.*)', infobox, re.I)
-            remtextnow = remtextnow.groups()[0].lower()
-            if remtextnow[-1] == '.':
-                remtextnow = remtextnow[:-1]
-
-            remtext[kwname] = remtextnow
-
-            logger.debug('SUCCESS: {}'.format(kwname))
-        except AttributeError:
-            logger.debug('SUCCESS: {} (no reminder text)'.format(kwname))
-        except Exception as e:
-            logger.warning('FAILURE: {}'.format(kwname))
-            logger.debug('\texception: {}'.format(e))
-
-    return remtext
+    global _MAX_WORKERS
+    # the thread count is deliberately not an argument of the cached function
+    # (it would be part of the cache key), so override the module default for
+    # the duration of this call instead
+    default_workers = _MAX_WORKERS
+    if max_workers is not None:
+        _MAX_WORKERS = max_workers
+    try:
+        if forcerefresh:
+            return _scrape_reminder_text.refresh()
+        return _scrape_reminder_text()
+    finally:
+        _MAX_WORKERS = default_workers
+
+
+@utils.file_cache(ttl=_CACHE_TTL)
+def _scrape_reminder_text():
+    # the keyword pages are independent, so fetch several at once over the
+    # shared keep-alive session
+    with concurrent.futures.ThreadPoolExecutor(_MAX_WORKERS) as ex:
+        return {kwname: remtextnow
+                for (kwname, remtextnow)
+                in ex.map(_keyword_reminder_text, _keyword_urls())
+                if remtextnow is not None}
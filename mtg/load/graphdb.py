@@ -15,16 +15,14 @@ Usage:
 
 """
 
+import concurrent.futures
 import itertools
 import logging
 import os
 
-import requests
-
 from neo4j.v1 import GraphDatabase, basic_auth
 
-from mtg import utils
-from mtg.cards import CARD_URL
+from mtg.cards import CARD_URL, get_allsets
 from mtg.extract.scg import ScgDeckParseError, scg_decks
 
 # ----------------------------- #
@@ -41,14 +39,18 @@ logging.getLogger('httpstream').setLevel(logging.WARNING)
 #   mtgjson uploading           #
 # ----------------------------- #
 
-MTGJSON_INSERT_QRY = """
-MERGE (s:MtgSet {code: {mtgset}.code})
+MTGSET_INSERT_QRY = """
+UNWIND {mtgsets} AS mtgset
+MERGE (s:MtgSet {code: mtgset.code})
   ON CREATE SET
-    s.name = {mtgset}.name,
-    s.releaseDate = {mtgset}.releaseDate,
-    s.type = {mtgset}.type
-WITH {mtgset}.cards AS mtgcards, s
-UNWIND mtgcards AS mtgcard
+    s.name = mtgset.name,
+    s.releaseDate = mtgset.releaseDate,
+    s.type = mtgset.type
+"""
+
+MTGCARD_INSERT_QRY = """
+MATCH (s:MtgSet {code: {code}})
+UNWIND {mtgcards} AS mtgcard
 MERGE (card:MtgCard {id: lower(mtgcard.name)})
   ON CREATE SET
     card.artist = mtgcard.artist,
@@ -74,8 +76,32 @@ MERGE (card)-[:PART_OF_SET]->(s)
 """
 
 
-def mtgjson_to_neo4j(url=CARD_URL, neo4juri=utils.NEO4J_URI, username=None,
-                     password=None):
+def _card_batches(sets, max_cards=1000):
+    """split every set's cards into (set code, chunk of cards) pairs of at
+    most `max_cards` cards, so that each chunk can be committed as its own
+    small transaction
+
+    """
+    for setdict in sets:
+        for chunk in _chunks(max_cards, setdict.get('cards', [])):
+            yield setdict['code'], list(chunk)
+
+
+def _insert_card_batch(driver, code, mtgcards):
+    """insert one chunk of a set's cards in its own session. concurrent MERGEs
+    on reprinted cards can deadlock, so run inside a managed write transaction
+    which the driver retries on transient errors
+
+    """
+    LOGGER.debug("inserting %s cards from set %s", len(mtgcards), code)
+    with driver.session() as session:
+        session.write_transaction(
+            lambda tx: tx.run(MTGCARD_INSERT_QRY,
+                              {'code': code, 'mtgcards': mtgcards}))
+
+
+def mtgjson_to_neo4j(url=CARD_URL, neo4juri=NEO4J_URI, username=None,
+                     password=None, max_cards=1000, max_workers=8):
     """neo4j can directly load json, we just have to get the query right. I
     think I have!
 
@@ -83,6 +109,10 @@ def mtgjson_to_neo4j(url=CARD_URL, neo4juri=utils.NEO4J_URI, username=None,
         url: (str) the url of the cards (must be a json api endpoint)
         user: (str) username for the neo4j db
         pw: (str) password for the neo4j db
+        max_cards: (int) maximum number of cards sent to neo4j in each
+            batched insert transaction (default: 1000)
+        max_workers: (int) number of batches sent to neo4j concurrently
+            (default: 8)
 
     returns:
         None
@@ -94,12 +124,24 @@ def mtgjson_to_neo4j(url=CARD_URL, neo4juri=utils.NEO4J_URI, username=None,
         session.run("create constraint on (s:MtgSet) assert s.code is unique")
         session.run("create constraint on (c:MtgCard) assert c.id is unique")
 
-        LOGGER.info('getting card data from {}'.format(url))
-        jcards = requests.get(url).json()
-        LOGGER.info('bulk loading to neo4j')
-        for (setid, setdict) in jcards.items():
-            LOGGER.debug("inserting set {}".format(setid))
-            session.run(MTGJSON_INSERT_QRY, {'mtgset': setdict})
+    LOGGER.info('getting card data from %s', url)
+    jcards = get_allsets(url)
+    LOGGER.info('bulk loading to neo4j')
+    # sets first (once each, without their cards), then the cards in small
+    # per-set chunks so no single transaction holds too many locks
+    with driver.session() as session:
+        session.run(MTGSET_INSERT_QRY,
+                    {'mtgsets': [{k: v for (k, v) in setdict.items()
+                                  if k != 'cards'}
+                                 for setdict in jcards.values()]})
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        futures = [executor.submit(_insert_card_batch, driver, code, mtgcards)
+                   for (code, mtgcards) in _card_batches(jcards.values(),
+                                                         max_cards)]
+        for future in concurrent.futures.as_completed(futures):
+            # surface any insert failures
+            future.result()
 
 
 # ----------------------------- #
@@ -151,6 +193,13 @@ def _chunks(n, iterable):
         yield chunk
 
 
+def _insert_scg_decks(tx, decks):
+    """the deck nodes and their board relationships for one chunk of decks,
+    sent together and committed once"""
+    tx.run(SCG_INSERT_DECKS_QRY, parameters={'decks': decks})
+    tx.run(SCG_INSERT_BOARDS_QRY, parameters={'decks': decks})
+
+
 def load_scg_decks_to_neo4j(neo4juri=NEO4J_URI, username=None, password=None):
     driver = GraphDatabase.driver(neo4juri, auth=basic_auth(username, password))
 
@@ -159,14 +208,13 @@ def load_scg_decks_to_neo4j(neo4juri=NEO4J_URI, username=None, password=None):
         session.run("create constraint on (d:MtgDeck) assert d.id is unique")
 
     LOGGER.info('bulk loading to neo4j')
-    for deckchunk in _chunks(1000, scg_decks()):
-        jsonchunk = []
-        for d in deckchunk:
-            try:
-                jsonchunk.append(d.to_dict())
-            except ScgDeckParseError:
-                continue
-
-        with driver.session() as session:
-            session.run(SCG_INSERT_DECKS_QRY, parameters={'decks': jsonchunk})
-            session.run(SCG_INSERT_BOARDS_QRY, parameters={'decks': jsonchunk})
+    with driver.session() as session:
+        for deckchunk in _chunks(1000, scg_decks()):
+            jsonchunk = []
+            for d in deckchunk:
+                try:
+                    jsonchunk.append(d.to_dict())
+                except ScgDeckParseError:
+                    continue
+
+            session.write_transaction(_insert_scg_decks, jsonchunk)
@@ -14,11 +14,18 @@ Usage:
 
 """
 
+import concurrent.futures
+import functools
+import hashlib
 import logging
 import os
+import pickle
+import tempfile
+import time
 
 import lxml.html
 import requests
+import requests.adapters
 
 
 # ----------------------------- #
@@ -28,15 +35,26 @@ import requests
 # local html caching
 HTML_DIR = os.path.join(os.sep, 'var', 'data', 'local_html_cache')
 
+# local pickle caching of function results (see `file_cache`)
+PICKLE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'mtg', 'pickles')
+
 LOGGER = logging.getLogger(__name__)
 
+# shared http session; keeps connections alive across calls and threads
+SESSION = requests.Session()
+for _prefix in ['http://', 'https://']:
+    SESSION.mount(_prefix,
+                  requests.adapters.HTTPAdapter(pool_connections=32,
+                                                pool_maxsize=32,
+                                                max_retries=3))
+
 
 # ----------------------------- #
 #   utility                     #
 # ----------------------------- #
 
 def url2html(url, localdir=HTML_DIR, forcerefresh=False, hidden=True,
-             session=requests):
+             session=SESSION):
     """General purpose download tool; will save html files locally instead of
     making re-requests
 
@@ -47,6 +65,7 @@ def url2html(url, localdir=HTML_DIR, forcerefresh=False, hidden=True,
         forcerefresh (bool): whether or not we ignore local copy
         hidden (bool): whether or not files are saved as hidden locally
         session (requests.Session): handy for multiple request scenarios
+            (default: SESSION)
 
     returns:
         lxml.html: parsed xml object obtained from possibly-cached raw html
@@ -62,11 +81,129 @@ def url2html(url, localdir=HTML_DIR, forcerefresh=False, hidden=True,
 
     # if we are calling out regardless (forcerefresh) or we have no local copy..
     if forcerefresh or not os.access(localname, os.R_OK):
-        LOGGER.debug('active download of url: {}'.format(url))
+        LOGGER.debug('active download of url: %s', url)
         resp = session.get(url)
         with open(localname, 'wb') as fp:
             fp.write(resp.content)
         return lxml.html.fromstring(resp.content)
     else:
+        # parse exactly as the download path does, so fragments and partial
+        # documents give the same root whether or not they were cached
         with open(localname, 'rb') as fp:
             return lxml.html.fromstring(fp.read())
+
+
+def url2html_many(urls, localdir=HTML_DIR, forcerefresh=False, hidden=True,
+                  session=SESSION, max_workers=16):
+    """url2html for many urls at once; the downloads run concurrently over the
+    (keep-alive) session
+
+    args:
+        urls (iterable): urls to request
+        localdir (str): directory in which we will save files
+            (default: common.HTML_DIR)
+        forcerefresh (bool): whether or not we ignore local copies
+        hidden (bool): whether or not files are saved as hidden locally
+        session (requests.Session): session shared by all of the downloads
+            (default: SESSION)
+        max_workers (int): maximum number of downloads in flight at once
+            (default: 16)
+
+    returns:
+        dict: url -> lxml.html parsed xml object for that url
+
+    raises:
+        None
+
+    """
+    urls = list(urls)
+    fetch = functools.partial(url2html, localdir=localdir,
+                              forcerefresh=forcerefresh, hidden=hidden,
+                              session=session)
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        return dict(zip(urls, executor.map(fetch, urls)))
+
+
+def atomic_write(path, chunks):
+    """write `chunks` of bytes to `path` through a temporary file in the same
+    directory which is only swapped in once complete, so an interrupted write
+    never leaves a truncated file behind
+
+    args:
+        path (str): destination file (its directory is created if needed)
+        chunks (iterable): bytes objects written to the file in order
+
+    returns:
+        None
+
+    raises:
+        None
+
+    """
+    dirname = os.path.dirname(path) or os.curdir
+    os.makedirs(dirname, exist_ok=True)
+    fd, tmpname = tempfile.mkstemp(dir=dirname, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            for chunk in chunks:
+                fp.write(chunk)
+        os.replace(tmpname, path)
+    except BaseException:
+        os.remove(tmpname)
+        raise
+
+
+def file_cache(ttl=None, cachedir=PICKLE_DIR):
+    """decorator which pickles a function's return values to local files keyed
+    on the function and its arguments, so that results survive across
+    processes (stack it under `functools.lru_cache` to also keep them in
+    memory)
+
+    args:
+        ttl (float): age in seconds after which a cached result is recomputed,
+            or None to keep results forever (default: None)
+        cachedir (str): directory in which we will save files
+            (default: PICKLE_DIR)
+
+    returns:
+        function: decorator for functions with repr-able arguments and
+            picklable return values. the decorated function's `refresh`
+            attribute recomputes and re-caches a result regardless of age
+
+    raises:
+        None
+
+    """
+    def decorator(f):
+        def _localname(args, kwargs):
+            key = repr((args, sorted(kwargs.items()))).encode()
+            return os.path.join(
+                cachedir, '{}.{}.{}.pkl'.format(
+                    f.__module__, f.__qualname__,
+                    hashlib.sha1(key).hexdigest()))
+
+        def refresh(*args, **kwargs):
+            """recompute the result and overwrite any cached copy"""
+            localname = _localname(args, kwargs)
+            result = f(*args, **kwargs)
+            atomic_write(localname,
+                         [pickle.dumps(result,
+                                       protocol=pickle.HIGHEST_PROTOCOL)])
+            return result
+
+        @functools.wraps(f)
+        def wrapped(*args, **kwargs):
+            localname = _localname(args, kwargs)
+            try:
+                age = time.time() - os.path.getmtime(localname)
+            except OSError:
+                age = None
+            if age is not None and (ttl is None or age < ttl):
+                LOGGER.debug('using cached result: %s', localname)
+                with open(localname, 'rb') as fp:
+                    return pickle.load(fp)
+            return refresh(*args, **kwargs)
+
+        wrapped.refresh = refresh
+        return wrapped
+    return decorator
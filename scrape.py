@@ -20,6 +20,11 @@ import logging.config
 import os
 import yaml
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 
 from mtg import cards, utils, decks
 from mtg.config import F_LOGGING_CONFIG
@@ -38,7 +43,7 @@ logging.getLogger("requests").setLevel(logging.WARNING)
 logger = logging.getLogger("scrape")
 
 with open(F_LOGGING_CONFIG, 'rb') as f:
-    logging.config.dictConfig(yaml.load(f))
+    logging.config.dictConfig(yaml.load(f, Loader=SafeLoader))
 
 
 # ----------------------------- #
@@ -62,7 +67,7 @@ def main(decksrc='scg2', neo4juri=NEO4J_URI, credyaml=F_CRED):
 
     """
     with open(credyaml, 'r') as f:
-        creds = yaml.load(f)
+        creds = yaml.load(f, Loader=SafeLoader)
 
     cards.json_to_neo4j(neo4juri=neo4juri, **creds)
     if decksrc == 'scg2':
@@ -92,7 +97,7 @@ def parse_args():
 
     args = parser.parse_args()
 
-    logger.debug("arguments set to {}".format(vars(args)))
+    logger.debug("arguments set to %s", vars(args))
 
     return args
 